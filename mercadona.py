@@ -1,16 +1,66 @@
 import pandas as pd
-import requests
-import json
+import httpx
+from aiolimiter import AsyncLimiter
+import asyncio
+import csv
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import orjson
 import os
-import time
 import random
+import sqlite3
+import time
 from datetime import datetime
 import sys
 import shutil
 
+def _decode_and_extract(db_path, product_ids):
+    """
+    Decodifica y extrae un lote de productos de la caché SQLite.
+    Se ejecuta en un proceso aparte: solo viajan los IDs y las filas planas.
+    """
+    db = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        placeholders = ",".join("?" * len(product_ids))
+        payloads = dict(db.execute(f"SELECT id, payload FROM products WHERE id IN ({placeholders})", product_ids))
+    finally:
+        db.close()
+    
+    records = []
+    for product_id in product_ids:
+        payload = payloads.get(product_id)
+        if payload is None:
+            continue
+        try:
+            product = orjson.loads(payload)
+        except orjson.JSONDecodeError as e:
+            print(f"  ! Entrada de caché no válida para el producto {product_id}: {str(e)}")
+            continue
+        structured = MercadonaCatalogGenerator.extract_product_data(product)
+        if structured:
+            records.append(structured)
+    return records
+
 class MercadonaCatalogGenerator:
     BASE_URL = "https://tienda.mercadona.es"
     CACHE_DIR = "mercadona_cache_v6"
+    CACHE_DB = "cache.sqlite3"
+    CATALOG_COLUMNS = (
+        "id", "nombre", "slug", "categoria_id", "categoria", "precio_total",
+        "precio_por_unidad", "unidad_medida", "iva", "empaque", "disponible", "url"
+    )
+    CATALOG_DTYPES = {
+        "id": "string", "nombre": "string", "slug": "string", "categoria_id": "string",
+        "categoria": "string", "precio_total": "float64", "precio_por_unidad": "float64",
+        "unidad_medida": "string", "iva": "string", "empaque": "string", "disponible": "boolean",
+        "url": "string"
+    }
+    MAX_CONCURRENCY = 64
+    MAX_REQUESTS_PER_SECOND = 5
+    MAX_RETRIES = 4
+    MAX_RETRY_AFTER = 60
+    REBUILD_BATCH_SIZE = 64
+    XSELLING_TTL = 7 * 24 * 3600  # segundos; pasado este plazo se vuelven a pedir los relacionados
     
     def __init__(self, lang="es", warehouse="vlc1"):
         """
@@ -23,10 +73,17 @@ class MercadonaCatalogGenerator:
         self.lang = lang
         self.warehouse = warehouse
         self.headers = self._create_headers()
+        
+        # URLs y parámetros de la API construidos una sola vez
+        self._product_url_tpl = f"{self.BASE_URL}/api/products/{{}}/"
+        self._xselling_url_tpl = f"{self.BASE_URL}/api/products/{{}}/xselling/"
+        self._product_params = {"lang": self.lang, "wh": self.warehouse}
+        self._xselling_params = {"lang": self.lang, "wh": self.warehouse, "exclude": ""}
         self._setup_directories()
         
         # Ruta fija para el catálogo actual
         self.catalog_path = os.path.join(self.base_dir, "catalogos", "catalogo_completo_actual.csv")
+        self.parquet_path = os.path.splitext(self.catalog_path)[0] + ".parquet"
         self.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         
         print(f"Directorio base configurado: {self.base_dir}")
@@ -55,51 +112,153 @@ class MercadonaCatalogGenerator:
     def _setup_directories(self):
         """Configura directorios con manejo robusto de rutas"""
         # Crear directorios en el directorio base
-        os.makedirs(os.path.join(self.CACHE_DIR, "products"), exist_ok=True)
-        os.makedirs(os.path.join(self.CACHE_DIR, "categories"), exist_ok=True)
+        os.makedirs(self.CACHE_DIR, exist_ok=True)
         os.makedirs(os.path.join(self.base_dir, "catalogos"), exist_ok=True)
+        
+        # Caché de productos en una única base SQLite en lugar de un JSON por producto
+        self.cache_db_path = os.path.join(self.CACHE_DIR, self.CACHE_DB)
+        self.cache_db = sqlite3.connect(self.cache_db_path, isolation_level=None)
+        self.cache_db.execute("PRAGMA journal_mode=WAL")
+        self.cache_db.execute("PRAGMA synchronous=NORMAL")
+        self.cache_db.execute("PRAGMA cache_size=-65536")
+        self.cache_db.execute(
+            "CREATE TABLE IF NOT EXISTS products (id TEXT PRIMARY KEY, payload BLOB, fetched_at INTEGER)"
+        )
+        self.cache_db.execute(
+            "CREATE TABLE IF NOT EXISTS xselling (id TEXT PRIMARY KEY, related_ids BLOB, fetched_at INTEGER)"
+        )
+        self._pending_products = []
+        self._pending_xselling = []
+        
+        # Índice en memoria de los IDs ya cacheados: un fallo de caché no consulta la base
+        self.cached_product_ids = {row[0] for row in self.cache_db.execute("SELECT id FROM products")}
+        self.cached_xselling_ids = {row[0] for row in self.cache_db.execute(
+            "SELECT id FROM xselling WHERE fetched_at >= ?", (int(time.time()) - self.XSELLING_TTL,)
+        )}
         print("Directorios configurados correctamente:")
         print(f"- Caché: {os.path.abspath(self.CACHE_DIR)}")
         print(f"- Catálogos: {os.path.join(self.base_dir, 'catalogos')}")
     
-    def _clean_product_id(self, product_id):
+    @staticmethod
+    def _clean_product_id(product_id):
         """Limpia el ID del producto"""
+        # Caso habitual: la API y las semillas ya entregan el ID como texto
+        if type(product_id) is str:
+            return product_id
         if isinstance(product_id, float) and product_id.is_integer():
             return str(int(product_id))
         return str(product_id)
     
-    def get_product_details(self, product_id):
+    async def _get_content(self, client, url, params):
+        """
+        GET acotado por el semáforo y el limitador de tasa, con backoff
+        exponencial ante 429/5xx que respeta la cabecera Retry-After.
+        Devuelve el cuerpo de la respuesta sin decodificar.
+        """
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.MAX_RETRIES + 1):
+            retry_after = None
+            throttled = False
+            # Pausa compartida: tras un 429/5xx ninguna petición sale hasta que venza
+            while (wait := self._paused_until - loop.time()) > 0:
+                await asyncio.sleep(wait)
+            try:
+                async with self._semaphore, self._limiter:
+                    response = await client.get(url, params=params)
+                if response.status_code == 200:
+                    return response.content
+                if response.status_code != 429 and response.status_code < 500:
+                    return None
+                retry_after = response.headers.get("Retry-After")
+                throttled = True
+            except httpx.TransportError:
+                # Conexión caída o expirada: se reintenta como un 5xx
+                if attempt == self.MAX_RETRIES:
+                    raise
+            if attempt < self.MAX_RETRIES:
+                if retry_after is not None and retry_after.isdigit():
+                    # Acotado: un Retry-After enorme no debe bloquear al trabajador
+                    delay = min(int(retry_after), self.MAX_RETRY_AFTER)
+                else:
+                    delay = min(30, 0.5 * 2 ** attempt) + random.uniform(0, 0.3)
+                if throttled:
+                    # El servidor pide frenar: la espera se aplica a todas las peticiones
+                    self._paused_until = max(self._paused_until, loop.time() + delay)
+                await asyncio.sleep(delay)
+        return None
+    
+    async def get_product_details(self, client, product_id):
         """Obtiene detalles de producto con caché"""
         clean_id = self._clean_product_id(product_id)
-        cache_file = os.path.join(self.CACHE_DIR, "products", f"{clean_id}.json")
         
         # Primero verificar en caché
-        if os.path.exists(cache_file):
+        if clean_id in self.cached_product_ids:
+            row = self.cache_db.execute("SELECT payload FROM products WHERE id = ?", (clean_id,)).fetchone()
             try:
-                with open(cache_file, "r", encoding="utf-8") as f:
-                    return json.load(f)
+                return orjson.loads(row[0])
             except:
                 pass
         
         # Si no está en caché, obtener de la API
-        url = f"{self.BASE_URL}/api/products/{clean_id}/"
-        params = {"lang": self.lang, "wh": self.warehouse}
         try:
-            time.sleep(max(0.5, 1.0 - random.uniform(0, 0.3)))
-            response = requests.get(url, headers=self.headers, params=params)
-            if response.status_code == 200:
-                product = response.json()
-                # Guardar en caché
-                os.makedirs(os.path.dirname(cache_file), exist_ok=True)
-                with open(cache_file, "w", encoding="utf-8") as f:
-                    json.dump(product, f, ensure_ascii=False, indent=2)
-                return product
-            return None
+            content = await self._get_content(client, self._product_url_tpl.format(clean_id), self._product_params)
+            if content is None:
+                return None
+            # Solo se cachean respuestas que son JSON válido (no, p. ej., una página HTML)
+            product = orjson.loads(content)
+            # Guardar en caché los bytes tal cual llegan (se escriben en bloque al final de la oleada)
+            self._pending_products.append((clean_id, content, int(time.time())))
+            return product
         except Exception as e:
             print(f"  ! Error al obtener producto {clean_id}: {str(e)}")
             return None
     
-    def extract_product_data(self, product):
+    def _flush_cache(self):
+        """Escribe en una sola transacción los productos y xselling descargados pendientes"""
+        if not self._pending_products and not self._pending_xselling:
+            return
+        self.cache_db.execute("BEGIN")
+        self.cache_db.executemany(
+            "INSERT OR REPLACE INTO products (id, payload, fetched_at) VALUES (?, ?, ?)",
+            self._pending_products
+        )
+        self.cache_db.executemany(
+            "INSERT OR REPLACE INTO xselling (id, related_ids, fetched_at) VALUES (?, ?, ?)",
+            self._pending_xselling
+        )
+        self.cache_db.execute("COMMIT")
+        self.cached_product_ids.update(row[0] for row in self._pending_products)
+        self.cached_xselling_ids.update(row[0] for row in self._pending_xselling)
+        self._pending_products = []
+        self._pending_xselling = []
+    
+    async def get_related_product_ids(self, client, product_id):
+        """Obtiene los IDs de productos relacionados (xselling) con caché"""
+        clean_id = self._clean_product_id(product_id)
+        
+        # Primero verificar en caché
+        if clean_id in self.cached_xselling_ids:
+            row = self.cache_db.execute("SELECT related_ids, fetched_at FROM xselling WHERE id = ?", (clean_id,)).fetchone()
+            try:
+                # Los relacionados caducan: si la entrada es antigua se vuelve a pedir
+                if row[1] >= time.time() - self.XSELLING_TTL:
+                    return orjson.loads(row[0])
+            except:
+                pass
+        
+        try:
+            content = await self._get_content(client, self._xselling_url_tpl.format(clean_id), self._xselling_params)
+            if content is None:
+                return []
+            related_ids = [item["id"] for item in orjson.loads(content).get("results", [])]
+            self._pending_xselling.append((clean_id, orjson.dumps(related_ids), int(time.time())))
+            return related_ids
+        except Exception as e:
+            print(f"  ! Error obteniendo productos relacionados para {product_id}: {str(e)}")
+            return []
+    
+    @staticmethod
+    def extract_product_data(product):
         """Extrae datos estructurados del producto"""
         if not product:
             return None
@@ -110,11 +269,11 @@ class MercadonaCatalogGenerator:
         category_id = None
         category_name = "Sin categoría"
         if product["categories"]:
-            category_id = self._clean_product_id(product["categories"][0]["id"])
+            category_id = MercadonaCatalogGenerator._clean_product_id(product["categories"][0]["id"])
             category_name = product["categories"][0]["name"]
         
         return {
-            "id": self._clean_product_id(product["id"]),
+            "id": MercadonaCatalogGenerator._clean_product_id(product["id"]),
             "nombre": product["display_name"],
             "slug": product["slug"],
             "categoria_id": category_id,
@@ -128,9 +287,129 @@ class MercadonaCatalogGenerator:
             "url": product["share_url"].strip() if product.get("share_url") else ""
         }
     
-    def build_full_catalog(self, max_products=2000, base_products_per_category=80, max_category_size=180):
+    def _catalog_writer(self, catalog_file):
+        """Crea el escritor CSV del catálogo y escribe la cabecera"""
+        writer = csv.DictWriter(catalog_file, fieldnames=self.CATALOG_COLUMNS, lineterminator="\n")
+        writer.writeheader()
+        return writer
+    
+    def _count_category(self, products_by_category, structured):
+        """Actualiza el conteo por categoría y devuelve el ID de la categoría"""
+        cat_id = structured["categoria_id"]
+        if cat_id not in products_by_category:
+            products_by_category[cat_id] = 0
+            self.category_names[cat_id] = structured["categoria"]
+        products_by_category[cat_id] += 1
+        return cat_id
+    
+    async def _crawl_async(self, strategic_seeds, max_products, catalog_file):
+        """
+        Recorre en anchura los productos relacionados partiendo de todas las
+        semillas. MAX_CONCURRENCY trabajadores consumen la frontera de forma
+        independiente, así una petición lenta no frena al resto.
+        Cada producto se escribe en catalog_file en cuanto se obtiene.
+        """
+        writer = self._catalog_writer(catalog_file)
+        product_count = 0
+        products_by_category = {}
+        self.category_names = {}
+        self._semaphore = asyncio.Semaphore(self.MAX_CONCURRENCY)
+        self._limiter = AsyncLimiter(self.MAX_REQUESTS_PER_SECOND, 1.0)
+        self._paused_until = 0.0
+        
+        # Una sola frontera para todas las semillas: cada producto (y su
+        # xselling) se pide como mucho una vez aunque varias semillas converjan
+        work_queue = asyncio.Queue()
+        for seed_id in strategic_seeds:
+            work_queue.put_nowait(seed_id)
+        # IDs que ya pasaron por la cola
+        queued = set(strategic_seeds)
+        # Productos en curso: no se piden más de los que faltan para el límite
+        in_flight = 0
+        slot_freed = asyncio.Condition()
+        
+        async def worker(client):
+            nonlocal product_count, in_flight
+            while True:
+                current_id = await work_queue.get()
+                try:
+                    async with slot_freed:
+                        await slot_freed.wait_for(
+                            lambda: product_count + in_flight < max_products or product_count >= max_products
+                        )
+                    # Alcanzado el límite, el resto de la cola se descarta sin pedirlo
+                    if product_count >= max_products:
+                        continue
+                    
+                    in_flight += 1
+                    try:
+                        # Detalles y xselling a la vez; no se amplía una frontera
+                        # que ya no se va a consumir
+                        if product_count + work_queue.qsize() < max_products * 1.5:
+                            api_data, related_ids = await asyncio.gather(
+                                self.get_product_details(client, current_id),
+                                self.get_related_product_ids(client, current_id)
+                            )
+                        else:
+                            api_data = await self.get_product_details(client, current_id)
+                            related_ids = []
+                    finally:
+                        in_flight -= 1
+                    
+                    if api_data is None:
+                        continue
+                    structured = self.extract_product_data(api_data)
+                    if structured:
+                        writer.writerow(structured)
+                        product_count += 1
+                        cat_id = self._count_category(products_by_category, structured)
+                        
+                        # Mostrar progreso
+                        if product_count % 20 == 0:
+                            print(f"  → {product_count} productos encontrados | {products_by_category[cat_id]} en {structured['categoria']}")
+                        
+                        # Volcar a disco el catálogo y la caché por bloques
+                        if product_count % self.MAX_CONCURRENCY == 0:
+                            catalog_file.flush()
+                            self._flush_cache()
+                    
+                    # Ampliar la frontera con los relacionados del producto obtenido
+                    for related_id in related_ids:
+                        if related_id not in queued:
+                            queued.add(related_id)
+                            work_queue.put_nowait(related_id)
+                finally:
+                    work_queue.task_done()
+                    async with slot_freed:
+                        slot_freed.notify_all()
+        
+        # Un único cliente HTTP/2: las peticiones concurrentes se multiplexan
+        # sobre las mismas conexiones keep-alive
+        limits = httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=30)
+        timeout = httpx.Timeout(10.0, connect=3.05)
+        
+        async with httpx.AsyncClient(http2=True, headers=self.headers, limits=limits,
+                                     timeout=timeout, follow_redirects=True) as client:
+            workers = [asyncio.create_task(worker(client)) for _ in range(self.MAX_CONCURRENCY)]
+            drained = asyncio.create_task(work_queue.join())
+            # Termina al vaciarse la cola, o antes si algún trabajador falla
+            done, _ = await asyncio.wait([drained, *workers], return_when=asyncio.FIRST_COMPLETED)
+            for task in [drained, *workers]:
+                task.cancel()
+            for task in done:
+                if task is not drained:
+                    task.result()
+        
+        catalog_file.flush()
+        self._flush_cache()
+        return product_count
+    
+    def build_full_catalog(self, max_products=2000, base_products_per_category=80, max_category_size=180,
+                           write_parquet=True):
         """
         Construye un catálogo completo desde cero
+        Args:
+            write_parquet: Guarda también una copia Parquet (zstd) junto al CSV
         """
         print("\n" + "="*70)
         print("GENERANDO CATÁLOGO COMPLETO DE MERCADONA")
@@ -144,94 +423,103 @@ class MercadonaCatalogGenerator:
             "28035", "4241"
         ]
         
-        all_products = []
-        products_by_category = {}
-        visited = set()
-        
         print(f"Usando {len(strategic_seeds)} semillas estratégicas para exploración completa")
         
-        # Explorar desde cada semilla
-        for i, seed_id in enumerate(strategic_seeds, 1):
-            print(f"\n({i}/{len(strategic_seeds)}) Explorando desde semilla: {seed_id}")
-            queue = [seed_id]
-            
-            while queue and len(all_products) < max_products:
-                current_id = queue.pop(0)
-                if current_id in visited:
-                    continue
-                
-                visited.add(current_id)
-                api_data = self.get_product_details(current_id)
-                
-                if api_data is not None:
-                    structured = self.extract_product_data(api_data)
-                    if structured:
-                        all_products.append(structured)
-                        cat_id = structured["categoria_id"]
-                        
-                        # Actualizar conteo por categoría
-                        if cat_id not in products_by_category:
-                            products_by_category[cat_id] = 0
-                        products_by_category[cat_id] += 1
-                        
-                        # Mostrar progreso
-                        if len(all_products) % 20 == 0:
-                            print(f"  → {len(all_products)} productos encontrados | {products_by_category[cat_id]} en {structured['categoria']}")
-                    
-                    # Obtener productos relacionados
-                    url = f"{self.BASE_URL}/api/products/{current_id}/xselling/"
-                    params = {
-                        "lang": self.lang,
-                        "wh": self.warehouse,
-                        "exclude": ""
-                    }
-                    try:
-                        time.sleep(0.3)
-                        response = requests.get(url, headers=self.headers, params=params)
-                        if response.status_code == 200:
-                            related_ids = [item["id"] for item in response.json().get("results", [])]
-                            for related_id in related_ids:
-                                if related_id not in visited and related_id not in queue:
-                                    queue.append(related_id)
-                    except Exception as e:
-                        print(f"  ! Error obteniendo productos relacionados para {current_id}: {str(e)}")
+        # Los productos se vuelcan a un fichero parcial según llegan; solo
+        # sustituye al catálogo actual si la exploración termina con éxito
+        os.makedirs(os.path.dirname(self.catalog_path), exist_ok=True)
+        partial_path = self.catalog_path + ".part"
+        with open(partial_path, "w", encoding="utf-8-sig", newline="") as catalog_file:
+            total_products = asyncio.run(
+                self._crawl_async(strategic_seeds, max_products, catalog_file)
+            )
         
-        # Crear DataFrame y guardar
-        if all_products:
-            catalog_df = pd.DataFrame(all_products)
-            
+        return self._publish_catalog(partial_path, total_products, write_parquet)
+    
+    def rebuild_from_cache(self, max_products=None, write_parquet=True):
+        """
+        Regenera el catálogo únicamente a partir de la caché local, sin llamar
+        a la API. La decodificación y extracción se reparten entre procesos.
+        """
+        print("\n" + "="*70)
+        print("REGENERANDO CATÁLOGO DESDE LA CACHÉ")
+        print("="*70)
+        
+        product_ids = [row[0] for row in self.cache_db.execute("SELECT id FROM products ORDER BY rowid")]
+        if max_products is not None:
+            product_ids = product_ids[:max_products]
+        batches = [
+            product_ids[i:i + self.REBUILD_BATCH_SIZE]
+            for i in range(0, len(product_ids), self.REBUILD_BATCH_SIZE)
+        ]
+        print(f"Productos en caché: {len(product_ids)}")
+        
+        total_products = 0
+        self.category_names = {}
+        os.makedirs(os.path.dirname(self.catalog_path), exist_ok=True)
+        partial_path = self.catalog_path + ".part"
+        with open(partial_path, "w", encoding="utf-8-sig", newline="") as catalog_file, \
+                ProcessPoolExecutor() as executor:
+            writer = self._catalog_writer(catalog_file)
+            for records in executor.map(partial(_decode_and_extract, self.cache_db_path), batches):
+                for structured in records:
+                    writer.writerow(structured)
+                    total_products += 1
+                    self.category_names.setdefault(structured["categoria_id"], structured["categoria"])
+        
+        return self._publish_catalog(partial_path, total_products, write_parquet)
+    
+    def _publish_catalog(self, partial_path, total_products, write_parquet):
+        """
+        Sustituye el catálogo actual por el fichero parcial, escribe la marca
+        de éxito y muestra el análisis. Devuelve el DataFrame o None.
+        """
+        if total_products:
+            # Validar el fichero parcial con el esquema tipado antes de publicarlo:
+            # si la lectura falla, el catálogo actual queda intacto
+            catalog_df = pd.read_csv(
+                partial_path,
+                usecols=self.CATALOG_COLUMNS,
+                dtype=self.CATALOG_DTYPES,
+                encoding="utf-8-sig",
+                engine="c"
+            )
             # Guardar catálogo completo en la ruta fija
-            os.makedirs(os.path.dirname(self.catalog_path), exist_ok=True)
-            catalog_df.to_csv(self.catalog_path, index=False, encoding="utf-8-sig")
+            os.replace(partial_path, self.catalog_path)
+            # Conteos para el informe sacados del propio catálogo (ya ordenados de mayor a menor)
+            category_counts = catalog_df["categoria_id"].value_counts(dropna=False)
             
             # Crear archivo de marca para indicar éxito
             with open(os.path.join(self.base_dir, "catalogos", "build_successful.txt"), "w") as f:
                 f.write(f"Última actualización: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                f.write(f"Total de productos: {len(all_products)}\n")
-                f.write(f"Categorías: {len(products_by_category)}\n")
+                f.write(f"Total de productos: {total_products}\n")
+                f.write(f"Categorías: {len(category_counts)}\n")
             
             # Mostrar análisis de categorías
             print("\n" + "="*50)
             print("ANÁLISIS DEL CATÁLOGO")
             print("="*50)
-            print(f"Total de productos: {len(all_products)}")
-            print(f"Total de categorías: {len(products_by_category)}")
+            print(f"Total de productos: {total_products}")
+            print(f"Total de categorías: {len(category_counts)}")
             
             # Mostrar las 5 categorías más grandes
-            sorted_categories = sorted(products_by_category.items(), key=lambda x: x[1], reverse=True)
             print("\nTOP 5 CATEGORÍAS MÁS GRANDES:")
-            for i, (cat_id, count) in enumerate(sorted_categories[:5], 1):
-                try:
-                    # Buscar el nombre de la categoría en los productos
-                    cat_name = next(p["categoria"] for p in all_products if p["categoria_id"] == cat_id)
-                    print(f"{i}. {cat_name}: {count} productos")
-                except:
-                    print(f"{i}. Categoría ID {cat_id}: {count} productos")
+            for i, (cat_id, count) in enumerate(category_counts.head(5).items(), 1):
+                if pd.isna(cat_id):
+                    cat_id = None
+                cat_name = self.category_names.get(cat_id, f"Categoría ID {cat_id}")
+                print(f"{i}. {cat_name}: {count} productos")
             
-            print(f"\nCATÁLOGO GENERADO CON ÉXITO: {len(all_products)} productos")
+            print(f"\nCATÁLOGO GENERADO CON ÉXITO: {total_products} productos")
             print(f"Archivo guardado como: {os.path.abspath(self.catalog_path)}")
+            
+            # Copia columnar, mucho más rápida de leer que el CSV
+            if write_parquet:
+                catalog_df.to_parquet(self.parquet_path, engine="pyarrow", compression="zstd", index=False)
+                print(f"Copia Parquet: {os.path.abspath(self.parquet_path)}")
             return catalog_df
         
+        os.remove(partial_path)
         print("\n❌ No se pudieron obtener productos. Verifica tu conexión o el código de almacén.")
         return None
 
@@ -243,10 +531,14 @@ if __name__ == "__main__":
     # Configuración desde variables de entorno (para GitHub Actions)
     warehouse_code = os.getenv('WAREHOUSE_CODE', 'vlc1')  # Valor por defecto para Valencia
     max_products = int(os.getenv('MAX_PRODUCTS', '2000'))
+    write_parquet = os.getenv('WRITE_PARQUET', '1') == '1'
+    rebuild_from_cache = os.getenv('REBUILD_FROM_CACHE', '0') == '1'
     
     print(f"\nConfiguración de ejecución:")
     print(f"- Código de almacén: {warehouse_code}")
     print(f"- Máximo de productos: {max_products}")
+    print(f"- Copia Parquet: {'sí' if write_parquet else 'no'}")
+    print(f"- Solo desde caché: {'sí' if rebuild_from_cache else 'no'}")
     
     # Crear instancia del sistema
     generator = MercadonaCatalogGenerator(
@@ -255,7 +547,10 @@ if __name__ == "__main__":
     )
     
     # Generar catálogo completo
-    catalog = generator.build_full_catalog(max_products=max_products)
+    if rebuild_from_cache:
+        catalog = generator.rebuild_from_cache(max_products=max_products, write_parquet=write_parquet)
+    else:
+        catalog = generator.build_full_catalog(max_products=max_products, write_parquet=write_parquet)
     
     if catalog is not None:
         print("\n✅ Proceso completado con éxito")